@@ -1,11 +1,10 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import torch
+import asyncio
+
 import cv2
 import numpy as np
-from PIL import Image
-import io
+from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from typing import List, Dict, Any
 import logging
 import traceback
@@ -21,7 +20,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Propaganda Spotter API",
     description="API for detecting and analyzing propaganda elements in images",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -43,14 +43,55 @@ app.add_middleware(
 propaganda_detector = None
 image_processor = None
 
+# Single shared GPU model — concurrent requests queue here instead of
+# racing each other into an OOM
+gpu_semaphore = None
+
+# Micro-batching: requests arriving within the batch window share one
+# CLIP forward pass instead of hitting the GPU with batch=1 each
+MAX_BATCH = 8
+BATCH_WINDOW_SECONDS = 0.015
+request_queue = None
+batch_worker_task = None
+
+
+async def batch_worker():
+    """Drain queued requests into small batches and scatter the results"""
+    while True:
+        batch = [await request_queue.get()]
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(
+                    await asyncio.wait_for(request_queue.get(), timeout=BATCH_WINDOW_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            async with gpu_semaphore:
+                results = await propaganda_detector.analyze_batch(
+                    [image for image, _, _ in batch],
+                    include_captions=[wants_caption for _, wants_caption, _ in batch]
+                )
+            for (_, _, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize models on startup"""
-    global propaganda_detector, image_processor
+    global propaganda_detector, image_processor, gpu_semaphore, request_queue, batch_worker_task
     try:
         logger.info("Loading propaganda detection model...")
         propaganda_detector = PropagandaDetector()
         image_processor = ImageProcessor()
+        gpu_semaphore = asyncio.Semaphore(1)
+        request_queue = asyncio.Queue()
+        batch_worker_task = asyncio.create_task(batch_worker())
         logger.info("Models loaded successfully!")
     except Exception as e:
         logger.error(f"Failed to load models: {e}")
@@ -69,22 +110,32 @@ async def health_check():
     }
 
 @app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(file: UploadFile = File(...), include_caption: bool = False):
     """
-    Analyze an uploaded image for propaganda elements
+    Analyze an uploaded image for propaganda elements.
+
+    Captioning runs a full BLIP generate pass, so it is opt-in via
+    ?include_caption=true.
     """
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read and process the image
+        # Decode once via OpenCV — the CLIP/BLIP processors accept ndarrays
+        # directly, so this skips a second Pillow decode/convert round-trip
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
+        image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Could not decode image")
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-        # Perform propaganda analysis
+        # Hand the image to the micro-batcher and wait for our slice of
+        # the batched result
         logger.info(f"Analyzing image: {file.filename}")
-        analysis_result = await propaganda_detector.analyze_image(image)
+        analysis_future = asyncio.get_event_loop().create_future()
+        await request_queue.put((image, include_caption, analysis_future))
+        analysis_result = await analysis_future
         
         # Process results for frontend
         bounding_boxes = []
@@ -133,4 +184,6 @@ async def analyze_image(file: UploadFile = File(...)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One worker: the models live on a single shared GPU and FastAPI's
+    # async handlers give us concurrency without replicating them
+    uvicorn.run(app, host="0.0.0.0", port=8000, workers=1, loop="uvloop")
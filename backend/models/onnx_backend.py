@@ -0,0 +1,174 @@
+import logging
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic, quantize_static
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Where exported/quantized models are cached between restarts
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("PROPAGANDA_ONNX_CACHE", Path.home() / ".cache" / "propaganda_spotter")
+)
+
+
+class _ClipVisionWrapper(torch.nn.Module):
+    """
+    Thin wrapper exposing only the image features, so the ONNX export has
+    a single well-defined output. The text tower is not exported — the
+    concept prompt embeddings are cached at startup on the PyTorch side.
+    """
+
+    def __init__(self, clip_model):
+        super().__init__()
+        self.clip_model = clip_model
+
+    def forward(self, pixel_values):
+        return self.clip_model.get_image_features(pixel_values=pixel_values)
+
+
+class ClipOnnxSession:
+    """
+    ONNX Runtime session serving the CLIP vision forward pass.
+
+    The PyTorch model is still required for Grad-CAM (it needs autograd),
+    so this session only accelerates the image-feature extraction.
+    """
+
+    def __init__(self, model_path: str):
+        available = ort.get_available_providers()
+        providers = []
+        if "TensorrtExecutionProvider" in available:
+            # TensorRT compiles the transformer into fused FP16 kernels and
+            # honors the INT8 Q/DQ nodes from quantization — noticeably
+            # faster than the plain CUDA provider for ViT workloads
+            providers.append((
+                "TensorrtExecutionProvider",
+                {
+                    "trt_fp16_enable": True,
+                    "trt_int8_enable": True,
+                    "trt_engine_cache_enable": True,
+                    "trt_engine_cache_path": str(DEFAULT_CACHE_DIR / "trt_engines"),
+                },
+            ))
+        providers += [
+            p for p in ("CUDAExecutionProvider", "CPUExecutionProvider")
+            if p in available
+        ]
+        self.session = ort.InferenceSession(model_path, providers=providers)
+        logger.info(f"ONNX session loaded from {model_path} with providers: {self.session.get_providers()}")
+
+    def image_features(self, pixel_values) -> np.ndarray:
+        """Run the quantized vision forward and return image features as numpy"""
+        outputs = self.session.run(
+            ["image_features"],
+            {"pixel_values": np.asarray(pixel_values, dtype=np.float32)}
+        )
+        return outputs[0]
+
+
+@contextmanager
+def _hooks_detached(model):
+    """
+    Temporarily strip instance hooks from every submodule for the export
+    deepcopy. Hooks registered by the detector (Grad-CAM) are bound
+    methods of the whole detector object, so copying them would drag
+    CUDA streams and the compiled tower into the copy along with the
+    weights.
+    """
+    attrs = ("_forward_pre_hooks", "_forward_hooks", "_backward_pre_hooks",
+             "_backward_hooks", "_full_backward_hooks")
+    saved = []
+    for module in model.modules():
+        present = {a: getattr(module, a) for a in attrs if hasattr(module, a)}
+        saved.append((module, present))
+        for a in present:
+            setattr(module, a, OrderedDict())
+    try:
+        yield
+    finally:
+        for module, present in saved:
+            for a, hooks in present.items():
+                setattr(module, a, hooks)
+
+
+def _export_clip_vision(clip_model, sample_pixel_values, output_path: Path):
+    """Export the CLIP vision tower to ONNX with a dynamic batch axis"""
+    wrapper = _ClipVisionWrapper(clip_model).eval()
+    torch.onnx.export(
+        wrapper,
+        (sample_pixel_values,),
+        str(output_path),
+        input_names=["pixel_values"],
+        output_names=["image_features"],
+        dynamic_axes={"pixel_values": {0: "batch"}},
+        opset_version=14,
+    )
+
+
+def _quantize_clip(fp32_path: Path, int8_path: Path, sample_pixel_values):
+    """
+    Apply INT8 post-training quantization. Static quantization with a
+    single calibration sample works well for CLIP; fall back to dynamic
+    quantization if calibration fails for the exported graph.
+    """
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _SingleSampleReader(CalibrationDataReader):
+        def __init__(self):
+            self._samples = iter([
+                {"pixel_values": sample_pixel_values.cpu().numpy()}
+            ])
+
+        def get_next(self):
+            return next(self._samples, None)
+
+    try:
+        quantize_static(str(fp32_path), str(int8_path), _SingleSampleReader())
+        logger.info("CLIP vision tower quantized with static INT8 calibration")
+    except Exception as e:
+        logger.warning(f"Static quantization failed ({e}), falling back to dynamic INT8")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+
+def create_clip_session(clip_model, clip_processor) -> ClipOnnxSession:
+    """
+    Export + quantize the CLIP vision tower (cached on disk) and return a
+    ready-to-use inference session.
+    """
+    if not ONNX_AVAILABLE:
+        raise RuntimeError("onnxruntime is not installed")
+
+    cache_dir = DEFAULT_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = cache_dir / "clip_vision.onnx"
+    int8_path = cache_dir / "clip_vision.int8.onnx"
+
+    if not int8_path.exists():
+        import copy
+        from PIL import Image
+        dummy_image = Image.new("RGB", (224, 224))
+        sample = clip_processor(images=dummy_image, return_tensors="pt")
+
+        # Export an FP32 CPU copy so the graph dtype is independent of
+        # whatever precision the live model runs at; hooks are detached
+        # around the copy so only the weights come along
+        with _hooks_detached(clip_model):
+            export_model = copy.deepcopy(clip_model).cpu().float()
+        logger.info("Exporting CLIP vision tower to ONNX...")
+        _export_clip_vision(export_model, sample.pixel_values, fp32_path)
+        del export_model
+        logger.info("Quantizing CLIP vision tower to INT8...")
+        _quantize_clip(fp32_path, int8_path, sample.pixel_values)
+
+    return ClipOnnxSession(str(int8_path))
@@ -1,16 +1,17 @@
+import asyncio
+import os
+from contextlib import nullcontext
+from functools import cached_property
+from types import SimpleNamespace
 import torch
 import torch.nn.functional as F
+from torchvision.transforms import v2
 from transformers import CLIPProcessor, CLIPModel, BlipProcessor, BlipForConditionalGeneration
-from PIL import Image
 import numpy as np
-import cv2
 import time
 from typing import Dict, List, Any, Tuple
 import logging
 import warnings
-from torchcam.methods import GradCAMpp
-from torchcam.utils import overlay_mask
-from torchvision.transforms.functional import to_pil_image, to_tensor
 
 # Suppress specific model warnings
 warnings.filterwarnings("ignore", message=".*BlipModel.*deprecated.*")
@@ -28,22 +29,91 @@ class PropagandaDetector:
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
-        
-        # Load CLIP model for propaganda detection
-        self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        if self.device.type == "cuda":
+            # Fixed input shapes, so the cudnn autotuner pays off; cap the
+            # memory fraction so we coexist with other processes on the GPU
+            torch.backends.cudnn.benchmark = True
+            torch.cuda.set_per_process_memory_fraction(0.7)
+            # Separate streams let the BLIP caption and CLIP detection
+            # overlap on the GPU instead of running back to back
+            self.stream_clip = torch.cuda.Stream()
+            self.stream_blip = torch.cuda.Stream()
+        else:
+            self.stream_clip = None
+            self.stream_blip = None
+
+        # Load CLIP model for propaganda detection. TinyCLIP has ~3x fewer
+        # parameters than ViT-B/32 with a small zero-shot quality delta;
+        # the original checkpoint can be restored via the env override.
+        clip_name = os.environ.get(
+            "PROPAGANDA_CLIP_MODEL", "wkcn/TinyCLIP-ViT-40M-32-Text-19M"
+        )
+        logger.info(f"Loading CLIP model: {clip_name}")
+        self.clip_model = CLIPModel.from_pretrained(clip_name)
+        self.clip_processor = CLIPProcessor.from_pretrained(clip_name)
         self.clip_model.to(self.device)
         self.clip_model.eval() # Set to evaluation mode
 
-        # Initialize Grad-CAM++ extractor
-        self.cam_extractor = GradCAMpp(self.clip_model, target_layer='vision_model.post_layernorm')
+        # Hooks on the vision tower's second-to-last encoder layer capture
+        # the activations/gradients Grad-CAM++ needs; CAMs for all
+        # detected classes are then computed in one vectorized pass. The
+        # layer choice matters twice over: post_layernorm has no token
+        # axis (HF CLIP applies it only to the pooled CLS vector), and the
+        # *last* layer's output gets gradient only at the CLS token for
+        # the same reason — the pooling never reads its patch tokens. One
+        # layer down, the final layer's attention still mixes patch tokens
+        # into CLS, so their gradients are nonzero.
+        self._cam_activations = None
+        self._cam_gradients = None
+        cam_layer = self.clip_model.vision_model.encoder.layers[-2]
+        cam_layer.register_forward_hook(self._save_cam_activations)
+        cam_layer.register_full_backward_hook(self._save_cam_gradients)
+
+        # Halve weight/activation bytes on GPU; ViT matmuls are memory-bound
+        # in FP32 and tensor cores roughly double throughput in FP16
+        self.use_fp16 = self.device.type == "cuda"
+        if self.use_fp16:
+            self.clip_model = self.clip_model.half()
+            logger.info("Running CLIP/BLIP in FP16 on CUDA")
+
+        # CLIP image preprocessing as tensor ops on the model device: one
+        # uint8 upload, then resize/crop/normalize there instead of PIL on
+        # the CPU. The processor is kept only for tokenization.
+        image_proc = self.clip_processor.image_processor
+        crop_size = image_proc.crop_size["height"]
+        self.preprocess_gpu = v2.Compose([
+            # Bicubic to match CLIPImageProcessor — the bilinear default
+            # drifts visibly from the training-time preprocessing
+            v2.Resize(crop_size, interpolation=v2.InterpolationMode.BICUBIC,
+                      antialias=True),
+            v2.CenterCrop(crop_size),
+            v2.ToDtype(torch.float16 if self.use_fp16 else torch.float32, scale=True),
+            v2.Normalize(mean=image_proc.image_mean, std=image_proc.image_std),
+        ])
+
+        # torch.compile with CUDA-graph capture removes the per-op launch
+        # overhead that dominates batch-1 ViT inference. Only the
+        # gradient-free scoring path uses the compiled tower — Grad-CAM
+        # keeps the eager module so its hooks still fire.
+        self.clip_vision_compiled = None
+        if self.device.type == "cuda" and os.environ.get("PROPAGANDA_DISABLE_COMPILE") != "1":
+            try:
+                self.clip_vision_compiled = torch.compile(
+                    self.clip_model.vision_model,
+                    mode="reduce-overhead", fullgraph=True, dynamic=False
+                )
+                warmup = torch.zeros(
+                    1, 3, crop_size, crop_size, device=self.device,
+                    dtype=torch.float16 if self.use_fp16 else torch.float32
+                )
+                with torch.inference_mode():
+                    for _ in range(3):
+                        self.clip_vision_compiled(pixel_values=warmup)
+                logger.info("CLIP vision tower compiled (reduce-overhead)")
+            except Exception as e:
+                logger.warning(f"torch.compile unavailable, staying eager: {e}")
+                self.clip_vision_compiled = None
 
-        # Load BLIP model for image captioning
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model.to(self.device)
-        self.blip_model.eval()
-        
         self.propaganda_concepts = [
             "authority figure in uniform", "military propaganda poster", "political rally with flags",
             "emotional manipulation imagery", "fear-inducing propaganda", "patriotic symbols and colors",
@@ -56,23 +126,85 @@ class PropagandaDetector:
             "patriotic": "#3b82f6", "leader": "#8b5cf6", "conflict": "#059669",
             "action": "#eab308", "historical": "#6b7280"
         }
-    
-    async def analyze_image(self, image: Image.Image) -> Dict[str, Any]:
+
+        # The concept list is fixed, so categorize/label/color each one
+        # once here instead of per detection in the hot path
+        self.concept_types = [self._categorize_concept(c) for c in self.propaganda_concepts]
+        self.concept_labels = [t.replace('_', ' ').title() for t in self.concept_types]
+        self.concept_colors = [self.color_map.get(t, "#6b7280") for t in self.concept_types]
+
+        # The concept prompts never change, so the text tower output is
+        # input-independent — encode once here and reuse for every request
+        with torch.no_grad():
+            text_inputs = self.clip_processor(
+                text=self.propaganda_concepts, return_tensors="pt", padding=True
+            ).to(self.device)
+            self.text_features = F.normalize(
+                self.clip_model.get_text_features(**text_inputs), dim=-1
+            ).float()
+
+        # Optional ONNX Runtime INT8 backend for the vision forward pass.
+        # Grad-CAM still goes through the PyTorch model (it needs autograd).
+        self.onnx_session = None
+        if os.environ.get("PROPAGANDA_USE_ONNX") == "1":
+            try:
+                from models.onnx_backend import create_clip_session
+                self.onnx_session = create_clip_session(self.clip_model, self.clip_processor)
+                logger.info("Using ONNX Runtime INT8 backend for CLIP scoring")
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable, using PyTorch: {e}")
+
+    @cached_property
+    def blip_model(self):
+        """
+        BLIP is only needed for captioning — load it on first use so cold
+        start and baseline VRAM stay small when captions are never requested
+        """
+        logger.info("Loading BLIP captioning model (first use)...")
+        model = BlipForConditionalGeneration.from_pretrained(
+            "Salesforce/blip-image-captioning-base",
+            torch_dtype=torch.float16 if self.use_fp16 else None,
+            low_cpu_mem_usage=True,
+        )
+        model.to(self.device)
+        model.eval()
+        return model
+
+    @cached_property
+    def blip_processor(self):
+        return BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
+
+    async def analyze_image(self, image: np.ndarray, include_caption: bool = False) -> Dict[str, Any]:
         start_time = time.time()
         logger.info("--- Starting New Image Analysis ---")
         try:
-            caption = await self._generate_caption(image)
-            
-            inputs = self.clip_processor(
-                text=self.propaganda_concepts, images=image, return_tensors="pt", padding=True
-            ).to(self.device)
-            
-            detections, clip_outputs = await self._detect_propaganda_elements(inputs)
-            
-            attention_maps = self._generate_attention_maps(inputs, detections, clip_outputs)
-            
+            # Captioning is opt-in: the BLIP generate loop costs a large
+            # share of end-to-end latency for what is only a text preamble.
+            # When requested, it runs on a worker thread (and its own CUDA
+            # stream) while CLIP runs here, instead of back to back.
+            caption_future = None
+            if include_caption:
+                caption_future = asyncio.get_event_loop().run_in_executor(
+                    None, self._caption_sync, image
+                )
+
+            clip_ctx = (
+                torch.cuda.stream(self.stream_clip)
+                if self.stream_clip is not None else nullcontext()
+            )
+            with clip_ctx:
+                inputs = SimpleNamespace(pixel_values=self._prepare_pixel_values(image))
+
+                detections = await self._detect_propaganda_elements(inputs)
+
+                attention_maps = self._generate_attention_maps(inputs, detections)
+
+            caption = await caption_future if caption_future is not None else ""
+            if self.device.type == "cuda":
+                torch.cuda.synchronize()
+
             bounding_boxes = self._create_bounding_boxes(attention_maps, detections)
-            
+
             analysis_text = await self._generate_analysis_text(caption, detections)
             
             processing_time = time.time() - start_time
@@ -90,46 +222,178 @@ class PropagandaDetector:
         except Exception as e:
             logger.error(f"Error in propaganda analysis: {e}", exc_info=True)
             raise e
-    
-    async def _generate_caption(self, image: Image.Image) -> str:
+
+    async def analyze_batch(self, images: List[np.ndarray],
+                            include_captions: List[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Analyze several images with a single batched CLIP scoring forward.
+        Used by the request micro-batcher in main.py; falls through to
+        analyze_image for the common single-request case.
+        """
+        if include_captions is None:
+            include_captions = [False] * len(images)
+        if len(images) == 1:
+            return [await self.analyze_image(images[0], include_captions[0])]
+
+        start_time = time.time()
+        logger.info(f"--- Starting Batched Analysis of {len(images)} images ---")
+
+        loop = asyncio.get_event_loop()
+        caption_futures = [
+            loop.run_in_executor(None, self._caption_sync, img) if wanted else None
+            for img, wanted in zip(images, include_captions)
+        ]
+
+        clip_ctx = (
+            torch.cuda.stream(self.stream_clip)
+            if self.stream_clip is not None else nullcontext()
+        )
+        per_image = []
+        with clip_ctx:
+            pixel_values = torch.cat(
+                [self._prepare_pixel_values(img) for img in images], dim=0
+            )
+            probs = self._score_images(pixel_values).softmax(dim=1)
+
+            # Scoring is batched; the CAM backward and bbox extraction stay
+            # per image since each has its own set of detected classes
+            for b in range(len(images)):
+                detections = self._build_detections(probs[b])
+                inputs = SimpleNamespace(pixel_values=pixel_values[b:b + 1])
+                attention_maps = self._generate_attention_maps(inputs, detections)
+                bounding_boxes = self._create_bounding_boxes(attention_maps, detections)
+                per_image.append((detections, bounding_boxes))
+
+        if self.device.type == "cuda":
+            torch.cuda.synchronize()
+
+        batch_time = time.time() - start_time
+        results = []
+        for (detections, bounding_boxes), caption_future in zip(per_image, caption_futures):
+            caption = await caption_future if caption_future is not None else ""
+            analysis_text = await self._generate_analysis_text(caption, detections)
+            overall_confidence = np.mean([det['confidence'] for det in detections]) if detections else 0.0
+            results.append({
+                'detections': bounding_boxes,
+                'analysis_text': analysis_text,
+                'overall_confidence': float(overall_confidence),
+                'processing_time': batch_time,
+                'image_caption': caption
+            })
+
+        logger.info(f"--- Batched Analysis Complete in {batch_time:.2f}s ---")
+        return results
+
+    def _prepare_pixel_values(self, image: np.ndarray) -> torch.Tensor:
+        """Upload the raw uint8 image once and preprocess it on-device"""
+        tensor = torch.from_numpy(image).permute(2, 0, 1).unsqueeze(0).contiguous()
+        if self.device.type == "cuda":
+            tensor = tensor.pin_memory().to(self.device, non_blocking=True)
+        else:
+            tensor = tensor.to(self.device)
+        return self.preprocess_gpu(tensor)
+
+    def _caption_sync(self, image: np.ndarray) -> str:
         try:
-            inputs = self.blip_processor(image, return_tensors="pt").to(self.device)
-            with torch.no_grad():
-                out = self.blip_model.generate(**inputs, max_length=50)
-                caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
+            blip_ctx = (
+                torch.cuda.stream(self.stream_blip)
+                if self.stream_blip is not None else nullcontext()
+            )
+            with blip_ctx:
+                inputs = self.blip_processor(image, return_tensors="pt").to(self.device)
+                if self.use_fp16:
+                    inputs["pixel_values"] = inputs.pixel_values.half()
+                # Greedy decoding with KV caching and a short budget — a
+                # one-line caption does not need beams or 50 tokens
+                generate_kwargs = dict(max_new_tokens=20, num_beams=1, use_cache=True)
+                with torch.inference_mode():
+                    if self.use_fp16:
+                        with torch.autocast("cuda", dtype=torch.float16):
+                            out = self.blip_model.generate(**inputs, **generate_kwargs)
+                    else:
+                        out = self.blip_model.generate(**inputs, **generate_kwargs)
+                    caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
             return caption
         except Exception as e:
             logger.error(f"Error generating caption: {e}")
             return "Unable to generate caption"
     
-    async def _detect_propaganda_elements(self, inputs) -> Tuple[List[Dict[str, Any]], Any]:
+    def _score_images(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Score a batch of preprocessed images against the cached concepts"""
+        if self.onnx_session is not None:
+            feats_np = self.onnx_session.image_features(pixel_values.cpu())
+            image_features = F.normalize(torch.from_numpy(feats_np).float(), dim=-1)
+            return (
+                self.clip_model.logit_scale.exp().float().cpu()
+                * image_features @ self.text_features.cpu().T
+            )
+        # Scoring never backpropagates — inference_mode also skips the
+        # autograd bookkeeping no_grad still pays for. The Grad-CAM step
+        # runs its own forward under enable_grad.
+        with torch.inference_mode():
+            return self._clip_logits(pixel_values, use_compiled=True).logits_per_image.clone()
+
+    def _build_detections(self, probs: torch.Tensor) -> List[Dict[str, Any]]:
+        """Turn one image's concept probabilities into detection dicts"""
+        probs_np = probs.detach().cpu().numpy()
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("CLIP Model Confidence Scores:")
+            for concept, confidence in zip(self.propaganda_concepts, probs_np):
+                logger.debug(f"  - '{concept}': {confidence:.4f}")
+
+        # Threshold and rank in numpy rather than a Python loop over concepts
+        idxs = np.where(probs_np > 0.10)[0]  # Lowered threshold for debugging
+        order = idxs[np.argsort(-probs_np[idxs])][:5]
+
+        detections = [
+            {
+                'id': f"detection_{j}", 'concept': self.propaganda_concepts[i],
+                'type': self.concept_types[i], 'confidence': float(probs_np[i]),
+                'label': self.concept_labels[i], 'color': self.concept_colors[i],
+                'class_index': int(i)
+            }
+            for j, i in enumerate(order)
+        ]
+        logger.info(f"Found {len(detections)} potential concepts above threshold.")
+        return detections
+
+    async def _detect_propaganda_elements(self, inputs) -> List[Dict[str, Any]]:
         logger.info("Step 1: Detecting propaganda elements...")
         try:
-            detections = []
-            outputs = self.clip_model(**inputs)
-            logits_per_image = outputs.logits_per_image
-            probs = logits_per_image.softmax(dim=1)
-            
-            logger.info("CLIP Model Confidence Scores:")
-            for i, concept in enumerate(self.propaganda_concepts):
-                confidence = float(probs[0][i])
-                logger.info(f"  - '{concept}': {confidence:.4f}")
-                if confidence > 0.10:  # Lowered threshold for debugging
-                    concept_type = self._categorize_concept(concept)
-                    detection = {
-                        'id': f"detection_{len(detections)}", 'concept': concept, 'type': concept_type,
-                        'confidence': confidence, 'label': concept_type.replace('_', ' ').title(),
-                        'color': self.color_map.get(concept_type, "#6b7280"), 'class_index': i
-                    }
-                    detections.append(detection)
-            
-            detections.sort(key=lambda x: x['confidence'], reverse=True)
-            logger.info(f"Found {len(detections)} potential concepts above threshold.")
-            
-            return detections[:5], outputs
+            probs = self._score_images(inputs.pixel_values).softmax(dim=1)
+            return self._build_detections(probs[0])
         except Exception as e:
             logger.error(f"Error detecting propaganda elements: {e}", exc_info=True)
-            return [], None
+            return []
+
+    def _clip_logits(self, pixel_values, use_compiled: bool = False) -> Any:
+        """Run only the vision tower and score against the cached text features"""
+        # The compiled tower was captured with dynamic=False at batch 1 —
+        # the shape where per-op launch overhead dominates. Any other size
+        # would trigger a Dynamo recompile + CUDA-graph capture while the
+        # GPU semaphore stalls the whole queue, so micro-batches from
+        # analyze_batch stay on the eager tower, where the larger batch
+        # already amortizes the launch overhead.
+        vision_model = (
+            self.clip_vision_compiled
+            if use_compiled and self.clip_vision_compiled is not None
+               and pixel_values.shape[0] == 1
+            else self.clip_model.vision_model
+        )
+        if self.use_fp16:
+            pixel_values = pixel_values.half()
+            with torch.autocast("cuda", dtype=torch.float16):
+                vision_outputs = vision_model(pixel_values=pixel_values)
+        else:
+            vision_outputs = vision_model(pixel_values=pixel_values)
+        # Index 1 is the pooled output, as in CLIPModel.get_image_features
+        image_features = self.clip_model.visual_projection(vision_outputs[1])
+        image_features = F.normalize(image_features.float(), dim=-1)
+        logits = self.clip_model.logit_scale.exp().float() * image_features @ self.text_features.T
+        # Mirror the shape of a full CLIPModel output so Grad-CAM scoring
+        # downstream keeps working
+        return SimpleNamespace(logits_per_image=logits)
 
     def _categorize_concept(self, concept: str) -> str:
         concept_lower = concept.lower()
@@ -143,71 +407,139 @@ class PropagandaDetector:
         if "historical" in concept_lower: return "historical"
         return "general"
 
-    def _generate_attention_maps(self, inputs, detections: List[Dict[str, Any]], clip_outputs) -> List[np.ndarray]:
+    def _save_cam_activations(self, module, inputs, output):
+        # Encoder layers return a tuple whose first element is the hidden
+        # states; that is the tensor the backward hook's grad_output[0]
+        # corresponds to as well
+        self._cam_activations = output[0] if isinstance(output, tuple) else output
+
+    def _save_cam_gradients(self, module, grad_input, grad_output):
+        self._cam_gradients = grad_output[0]
+
+    def _generate_attention_maps(self, inputs, detections: List[Dict[str, Any]]) -> torch.Tensor:
         logger.info(f"Step 2: Generating {len(detections)} attention maps...")
         try:
-            attention_maps = []
-            if not detections: return attention_maps
+            if not detections: return torch.empty(0)
 
-            # Use the full logits from the clip model output
-            scores = clip_outputs.logits_per_image
+            k = len(detections)
+            class_indices = torch.tensor(
+                [det['class_index'] for det in detections], device=self.device
+            )
 
-            for detection in detections:
-                class_index = detection['class_index']
-
-                # We need to clear grads before each new computation
-                self.clip_model.zero_grad()
-                cams = self.cam_extractor(class_idx=class_index, scores=scores)
-                
-                if not cams or not isinstance(cams[0], torch.Tensor):
-                    logger.warning(f"  - CAM generation failed for concept: {detection['concept']}")
-                    continue
+            # One forward/backward over a K-replicated batch yields per-class
+            # gradients for every detection at once, instead of K separate
+            # backward passes through the ViT. Gradients are enabled only
+            # for this narrow scope — the rest of the pipeline runs under
+            # inference_mode.
+            self.clip_model.zero_grad(set_to_none=True)
+            with torch.enable_grad():
+                batch = inputs.pixel_values.detach().repeat(k, 1, 1, 1).requires_grad_(True)
+                scores = self._clip_logits(batch).logits_per_image
+                scores[torch.arange(k, device=self.device), class_indices].sum().backward()
 
-                # Process CAM for output
-                cam = to_pil_image(cams[0].squeeze(0), mode='F')
-                cam_np = np.array(cam)
-                cam_np = cv2.resize(cam_np, (inputs.pixel_values.shape[3], inputs.pixel_values.shape[2]))
-                cam_np = (cam_np - np.min(cam_np)) / (np.max(cam_np) - np.min(cam_np) + 1e-8)
-                attention_maps.append(cam_np)
-                logger.info(f"  - Successfully generated CAM for: {detection['concept']}")
+            # A hooked layer without a token axis (e.g. one applied only
+            # to the pooled vector) would silently break every downstream
+            # step — fail loudly instead
+            assert self._cam_activations.dim() == 3, (
+                f"CAM hook captured shape {tuple(self._cam_activations.shape)}; "
+                "expected [K, tokens, C] — the hooked layer has no token axis"
+            )
 
-            return attention_maps
+            # Drop the CLS token; the patch tokens form the spatial grid.
+            # Keep the CAM math in FP32 — half-precision gradients are too
+            # coarse for the weighting terms.
+            acts = self._cam_activations.float()[:, 1:, :]   # [K, N, C]
+            grads = self._cam_gradients.float()[:, 1:, :]    # [K, N, C]
+
+            # Identically-zero patch gradients mean the hooked layer sits
+            # downstream of the CLS pooling — the shape looks fine but
+            # every CAM (and thus every bounding box) would be empty
+            assert torch.any(grads != 0), (
+                "CAM patch-token gradients are identically zero — the hooked "
+                "layer does not influence the pooled output through its patch tokens"
+            )
+
+            # GradCAM++ weighting, batched over all detections
+            grads_sq = grads.pow(2)
+            alpha = grads_sq / (
+                2 * grads_sq + (acts * grads.pow(3)).sum(dim=1, keepdim=True) + 1e-8
+            )
+            weights = (alpha * F.relu(grads)).sum(dim=1)               # [K, C]
+            cams = F.relu((weights[:, None, :] * acts).sum(dim=-1))    # [K, N]
+
+            side = int(cams.shape[-1] ** 0.5)
+            cams = cams.view(k, side, side).detach()
+
+            # No upsample: the bbox step works in percentage space, so the
+            # native patch grid (e.g. 7x7) yields the same boxes as a
+            # bilinear blow-up to 224x224 while thresholding ~1000x fewer
+            # pixels. Min-max normalize all K maps in one vectorized pass.
+            flat = cams.flatten(1)
+            mn = flat.min(dim=1, keepdim=True).values
+            mx = flat.max(dim=1, keepdim=True).values
+            norm = ((flat - mn) / (mx - mn + 1e-8)).view_as(cams)
+
+            logger.info(f"  - Generated {k} CAMs in a single batch.")
+            return norm
+        except AssertionError:
+            # A mis-hooked CAM layer is a configuration bug, not a
+            # per-request hiccup — let it take the request down
+            raise
         except Exception as e:
             logger.error(f"Error generating attention maps: {e}", exc_info=True)
-            return []
+            return torch.empty(0)
 
-    def _create_bounding_boxes(self, attention_maps: List[np.ndarray], detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _create_bounding_boxes(self, attention_maps: torch.Tensor, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         logger.info(f"Step 3: Creating bounding boxes from {len(attention_maps)} attention maps...")
         try:
             bounding_boxes = []
-            for i, (attention_map, detection) in enumerate(zip(attention_maps, detections)):
-                if attention_map.size == 0: continue
-
-                threshold = np.quantile(attention_map, 0.85) # Top 15% of attention
-                logger.info(f"  - For '{detection['concept']}', attention threshold set to {threshold:.4f}")
-                binary_mask = (attention_map > threshold).astype(np.uint8)
-                
-                contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                logger.info(f"  - Found {len(contours)} contours.")
-
-                if contours:
-                    largest_contour = max(contours, key=cv2.contourArea)
-                    x, y, w, h = cv2.boundingRect(largest_contour)
-                    
-                    img_h, img_w = attention_map.shape
-                    x_pct, y_pct = (x / img_w) * 100, (y / img_h) * 100
-                    w_pct, h_pct = (w / img_w) * 100, (h / img_h) * 100
-                    
-                    bbox = {
-                        'id': detection['id'], 'bbox': [x_pct, y_pct, w_pct, h_pct],
-                        'label': detection['label'], 'color': detection['color'],
-                        'confidence': detection['confidence'], 'type': detection['type']
-                    }
-                    bounding_boxes.append(bbox)
-                    logger.info(f"  - Created bounding box for '{detection['concept']}'.")
-                else:
-                    logger.warning(f"  - No contours found for '{detection['concept']}', skipping bounding box.")
-            
+            if len(attention_maps) == 0:
+                return bounding_boxes
+
+            k, img_h, img_w = attention_maps.shape
+
+            # Keep the top 15% of attention per map. kthvalue avoids the
+            # full sort np.quantile would run, and the masks stay on the
+            # model device
+            n_pixels = img_h * img_w
+            kth = max(1, n_pixels - int(0.15 * n_pixels))
+            thresholds = attention_maps.view(k, -1).kthvalue(kth, dim=1).values
+            masks = attention_maps > thresholds[:, None, None]
+
+            coords, kept = [], []
+            for i, detection in enumerate(detections):
+                idx = masks[i].nonzero()
+                if idx.numel() == 0:
+                    logger.warning(f"  - No pixels above threshold for '{detection['concept']}', skipping bounding box.")
+                    continue
+
+                # The extent of the above-threshold region is the bbox; no
+                # contour extraction needed since only one box is kept
+                y0, x0 = idx.min(dim=0).values
+                y1, x1 = idx.max(dim=0).values
+                coords.append(torch.stack([x0, y0, x1 - x0 + 1, y1 - y0 + 1]))
+                kept.append(detection)
+
+            if not coords:
+                return bounding_boxes
+
+            # One broadcast converts every box to percentage space instead
+            # of per-element Python arithmetic
+            boxes = torch.stack(coords).float()
+            scale = torch.tensor(
+                [img_w, img_h, img_w, img_h], dtype=torch.float32, device=boxes.device
+            )
+            pct = (boxes * 100.0 / scale).cpu().numpy()
+
+            bounding_boxes = [
+                {
+                    'id': det['id'], 'bbox': pct[i].tolist(),
+                    'label': det['label'], 'color': det['color'],
+                    'confidence': det['confidence'], 'type': det['type']
+                }
+                for i, det in enumerate(kept)
+            ]
+
             logger.info(f"Successfully created {len(bounding_boxes)} bounding boxes.")
             return bounding_boxes
         except Exception as e:
@@ -220,10 +552,10 @@ class PropagandaDetector:
             if not detections:
                 return "No significant propaganda elements detected in this image."
             
-            analysis_parts = [
-                f"**Image Analysis**: {caption}\n",
-                "**Detected Propaganda Elements**:\n"
-            ]
+            analysis_parts = []
+            if caption:
+                analysis_parts.append(f"**Image Analysis**: {caption}\n")
+            analysis_parts.append("**Detected Propaganda Elements**:\n")
             
             # Group detections by type
             type_groups = {}
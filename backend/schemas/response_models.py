@@ -1,7 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 
-class BoundingBox(BaseModel):
+
+class ResponseModel(BaseModel):
+    """
+    Base for response-only models: no extra fields and no assignment
+    validation, keeping the per-request validation pass as cheap as
+    Pydantic v2 allows
+    """
+    model_config = ConfigDict(extra='forbid', validate_assignment=False)
+
+
+class BoundingBox(ResponseModel):
     id: str
     x: float  # x coordinate as percentage
     y: float  # y coordinate as percentage  
@@ -11,12 +21,12 @@ class BoundingBox(BaseModel):
     color: str
     confidence: float
 
-class HighlightedWord(BaseModel):
+class HighlightedWord(ResponseModel):
     word: str
     id: str
     color: str
 
-class AnalysisResponse(BaseModel):
+class AnalysisResponse(ResponseModel):
     success: bool
     analysis_text: str
     bounding_boxes: List[BoundingBox]
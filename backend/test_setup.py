@@ -61,9 +61,10 @@ async def test_analysis():
     try:
         from models.propaganda_detector import PropagandaDetector
         
-        # Create a simple test image
-        test_image = Image.new('RGB', (256, 256), color='red')
-        
+        # Create a simple test image — analyze_image takes a decoded RGB
+        # ndarray, matching what the /analyze handler passes
+        test_image = np.asarray(Image.new('RGB', (256, 256), color='red'))
+
         detector = PropagandaDetector()
         result = await detector.analyze_image(test_image)
         